@@ -0,0 +1,271 @@
+"""
+A compact archive of raw HTML responses for re-parsing historical crawls.
+
+Responses are stored in a single SQLite file, indexed by URL and crawl time,
+with each body compressed by zstd. Bitdegree pages share most of their markup,
+so a dictionary trained on the pages of a crawl is stored alongside the data and
+used for later crawls, which shrinks each page far below what compressing it on
+its own achieves. Dictionaries are never replaced in place: retraining adds a
+new one, and every record keeps a reference to the dictionary it was written
+with.
+"""
+
+# Import libraries
+import sqlite3
+import time
+
+import zstandard
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawls (
+    crawl_time TEXT PRIMARY KEY,
+    deep_crawl INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY,
+    crawl_time TEXT NOT NULL,
+    url TEXT NOT NULL,
+    response_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    encoding TEXT,
+    fetched_at REAL NOT NULL,
+    dictionary_id INTEGER REFERENCES dictionaries (id),
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_url_crawl ON responses (url, crawl_time);
+CREATE INDEX IF NOT EXISTS responses_crawl ON responses (crawl_time);
+"""
+
+
+class HtmlArchive:
+    """
+    Reads and writes zstd-compressed responses in an SQLite archive file.
+    """
+
+    def __init__(self, path, compression_level=10):
+        """
+        Args:
+            path (str): Path to the archive file; it is created if missing.
+            compression_level (int): The zstd compression level for new records.
+        """
+        self.path = path
+        self.compression_level = compression_level
+        self.connection = sqlite3.connect(path)
+        # The crawl commits once per response; WAL with NORMAL sync avoids an fsync per page
+        # while keeping every committed page across a process crash.
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self._compressors = {}
+        self._decompressors = {}
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def add_crawl(self, crawl_time, deep_crawl=False):
+        """
+        Records the options a crawl ran with, so it can be replayed the same way.
+
+        Args:
+            crawl_time (str): Identifies the crawl.
+            deep_crawl (bool): Whether the crawl followed coin and pair detail pages.
+        """
+        self.connection.execute(
+            'INSERT OR REPLACE INTO crawls (crawl_time, deep_crawl) VALUES (?, ?)', (crawl_time, int(deep_crawl)))
+        self.connection.commit()
+
+    def crawl_options(self, crawl_time):
+        """
+        Returns:
+            dict: The options recorded for a crawl; crawls archived before options were
+            recorded are treated as normal (not deep) crawls.
+        """
+        row = self.connection.execute(
+            'SELECT deep_crawl FROM crawls WHERE crawl_time = ?', (crawl_time,)).fetchone()
+        return {'deep_crawl': bool(row and row[0])}
+
+    def latest_dictionary_id(self):
+        """
+        Returns:
+            int | None: The id of the most recently trained dictionary, if any.
+        """
+        row = self.connection.execute('SELECT MAX(id) FROM dictionaries').fetchone()
+        return row[0]
+
+    def train_dictionary(self, samples, dict_size=112640):
+        """
+        Trains a zstd dictionary on sample bodies and stores it in the archive.
+
+        Args:
+            samples (list[bytes]): Raw response bodies to train on.
+            dict_size (int): The maximum dictionary size in bytes.
+
+        Returns:
+            int | None: The id of the new dictionary, or None when zstd could not
+            train one from the samples (for example, too few of them).
+        """
+        try:
+            dictionary = zstandard.train_dictionary(dict_size, samples)
+        except zstandard.ZstdError:
+            return None
+        cursor = self.connection.execute(
+            'INSERT INTO dictionaries (created_at, data) VALUES (?, ?)',
+            (time.time(), dictionary.as_bytes()))
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def train_dictionary_from_crawl(self, crawl_time, dict_size=112640, max_samples=100):
+        """
+        Trains a new dictionary on the first pages of one archived crawl.
+
+        Samples are capped both in number and at about 100 times the dictionary size in
+        total, which is what zstd recommends, so training a deep crawl stays cheap.
+
+        Args:
+            crawl_time (str): The crawl whose pages are used as samples.
+            dict_size (int): The maximum dictionary size in bytes.
+            max_samples (int): Caps how many pages are loaded for training.
+
+        Returns:
+            int | None: The id of the new dictionary, see `train_dictionary`.
+        """
+        rows = self.connection.execute(
+            'SELECT dictionary_id, body FROM responses WHERE crawl_time = ? ORDER BY id LIMIT ?',
+            (crawl_time, max_samples))
+        samples = []
+        total_size = 0
+        for dictionary_id, body in rows:
+            sample = self._decompressor(dictionary_id).decompress(body)
+            samples.append(sample)
+            total_size += len(sample)
+            if total_size >= 100 * dict_size:
+                break
+        rows.close()
+        return self.train_dictionary(samples, dict_size)
+
+    def recompress_crawl(self, crawl_time, dictionary_id, batch_size=100):
+        """
+        Rewrites every record of one crawl compressed with the given dictionary.
+
+        Records are processed and committed in batches by id, so memory use does not
+        grow with the size of the crawl.
+
+        Args:
+            crawl_time (str): The crawl to rewrite.
+            dictionary_id (int | None): The dictionary to compress with, if any.
+            batch_size (int): How many records are loaded and committed at a time.
+        """
+        last_id = 0
+        while True:
+            rows = self.connection.execute(
+                'SELECT id, dictionary_id, body FROM responses WHERE crawl_time = ? AND id > ?'
+                ' ORDER BY id LIMIT ?', (crawl_time, last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            for row_id, old_dictionary_id, body in rows:
+                if old_dictionary_id == dictionary_id:
+                    continue
+                body = self._decompressor(old_dictionary_id).decompress(body)
+                self.connection.execute(
+                    'UPDATE responses SET dictionary_id = ?, body = ? WHERE id = ?',
+                    (dictionary_id, self._compressor(dictionary_id).compress(body), row_id))
+            self.connection.commit()
+            last_id = rows[-1][0]
+
+    def _dictionary(self, dictionary_id):
+        data = self.connection.execute(
+            'SELECT data FROM dictionaries WHERE id = ?', (dictionary_id,)).fetchone()[0]
+        return zstandard.ZstdCompressionDict(data)
+
+    def _compressor(self, dictionary_id):
+        if dictionary_id not in self._compressors:
+            kwargs = {'dict_data': self._dictionary(dictionary_id)} if dictionary_id else {}
+            self._compressors[dictionary_id] = zstandard.ZstdCompressor(level=self.compression_level, **kwargs)
+        return self._compressors[dictionary_id]
+
+    def _decompressor(self, dictionary_id):
+        if dictionary_id not in self._decompressors:
+            kwargs = {'dict_data': self._dictionary(dictionary_id)} if dictionary_id else {}
+            self._decompressors[dictionary_id] = zstandard.ZstdDecompressor(**kwargs)
+        return self._decompressors[dictionary_id]
+
+    def add(self, crawl_time, url, response_url, status, encoding, body, fetched_at=None, dictionary_id=None):
+        """
+        Compresses and stores one response.
+
+        Args:
+            crawl_time (str): Identifies the crawl the response belongs to.
+            url (str): The URL the spider requested (before any redirect).
+            response_url (str): The URL the response was finally served from.
+            status (int): The HTTP status code.
+            encoding (str | None): The response text encoding.
+            body (bytes): The raw response body.
+            fetched_at (float | None): When the response was received; defaults to now.
+            dictionary_id (int | None): The dictionary to compress with, if any.
+        """
+        compressed = self._compressor(dictionary_id).compress(body)
+        self.connection.execute(
+            'INSERT INTO responses (crawl_time, url, response_url, status, encoding, fetched_at, dictionary_id, body)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (crawl_time, url, response_url, status, encoding,
+             fetched_at if fetched_at is not None else time.time(), dictionary_id, compressed))
+
+    def commit(self):
+        self.connection.commit()
+
+    def crawl_times(self):
+        """
+        Returns:
+            list[str]: The crawl times stored in the archive, oldest first.
+        """
+        rows = self.connection.execute('SELECT DISTINCT crawl_time FROM responses ORDER BY crawl_time')
+        return [row[0] for row in rows]
+
+    def response(self, crawl_time, url):
+        """
+        Looks up one archived response by URL and crawl time.
+
+        Args:
+            crawl_time (str): The crawl the response belongs to.
+            url (str): The requested URL, without its fragment.
+
+        Returns:
+            dict | None: The stored fields with `body` decompressed, or None if not archived.
+        """
+        row = self.connection.execute(
+            'SELECT url, response_url, status, encoding, fetched_at, dictionary_id, body'
+            ' FROM responses WHERE url = ? AND crawl_time = ? ORDER BY id LIMIT 1', (url, crawl_time)).fetchone()
+        return self._record(row) if row else None
+
+    def _record(self, row):
+        url, response_url, status, encoding, fetched_at, dictionary_id, body = row
+        return {
+            'url': url,
+            'response_url': response_url,
+            'status': status,
+            'encoding': encoding,
+            'fetched_at': fetched_at,
+            'body': self._decompressor(dictionary_id).decompress(body),
+        }
+
+    def responses(self, crawl_time):
+        """
+        Yields every response of one crawl, decompressed.
+
+        Args:
+            crawl_time (str): The crawl to read.
+
+        Yields:
+            dict: The stored fields of each response, with `body` as raw bytes.
+        """
+        rows = self.connection.execute(
+            'SELECT url, response_url, status, encoding, fetched_at, dictionary_id, body'
+            ' FROM responses WHERE crawl_time = ? ORDER BY id', (crawl_time,))
+        for row in rows:
+            yield self._record(row)
@@ -0,0 +1,156 @@
+# Define here the request duplicates filters for your project
+#
+# Don't forget to point the DUPEFILTER_CLASS setting at the filter
+# See: https://docs.scrapy.org/en/latest/topics/settings.html#dupefilter-class
+
+import hashlib
+import math
+import os
+import struct
+
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.utils.job import job_dir
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter over request fingerprints.
+
+    Memory use is set up front from the expected number of entries and the
+    acceptable false positive rate, and does not grow as URLs are added.
+    """
+    HEADER = struct.Struct('>4sQQIQ')
+    MAGIC = b'BLM2'
+
+    def __init__(self, capacity, error_rate, num_bits=None, num_hashes=None, count=0, bits=None):
+        """
+        Args:
+            capacity (int): The number of fingerprints the filter is sized for.
+            error_rate (float): The false positive rate expected at capacity.
+        """
+        if num_bits is None:
+            num_bits, num_hashes = self.size_for(capacity, error_rate)
+        elif capacity <= 0:
+            raise ValueError('Bloom filter capacity must be positive, got %r' % capacity)
+        if num_hashes is None:
+            num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        self.capacity = capacity
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @staticmethod
+    def size_for(capacity, error_rate):
+        """
+        Returns:
+            tuple: The number of bits and hash functions for a capacity and error rate.
+        """
+        if capacity <= 0:
+            raise ValueError('Bloom filter capacity must be positive, got %r' % capacity)
+        if not 0 < error_rate < 1:
+            raise ValueError('Bloom filter error rate must be between 0 and 1, got %r' % error_rate)
+        num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        return num_bits, max(1, int(round(num_bits / capacity * math.log(2))))
+
+    def _positions(self, fingerprint):
+        # Kirsch-Mitzenmacher double hashing: k positions from two 64-bit hashes.
+        digest = hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('>QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def __contains__(self, fingerprint):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fingerprint))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, fingerprint):
+        for pos in self._positions(fingerprint):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.capacity, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            header = f.read(cls.HEADER.size)
+            if len(header) != cls.HEADER.size or header[:4] != cls.MAGIC:
+                raise ValueError('%s is not a Bloom filter file' % path)
+            _, capacity, num_bits, num_hashes, count = cls.HEADER.unpack(header)
+            bits = bytearray(f.read())
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError('%s is truncated' % path)
+        return cls(capacity, None, num_bits=num_bits, num_hashes=num_hashes, count=count, bits=bits)
+
+
+class BloomDupeFilter(RFPDupeFilter):
+    """
+    A request fingerprint duplicates filter that uses a Bloom filter for bulk requests.
+
+    Requests with `meta['bloom_dupefilter']` set (the deep-crawl coin and pair
+    pages) are checked against a bounded bit array instead of a set of every
+    fingerprint seen. All other requests keep Scrapy's exact deduplication: a
+    false positive there would silently drop a markets page together with the
+    data accumulated in its meta.
+
+    When the crawl runs with JOBDIR the Bloom filter is saved to
+    `<JOBDIR>/requests.bloom` on close and loaded again on resume, next to the
+    exact `requests.seen`, so a paused deep crawl does not refetch pages it
+    already followed. A resumed crawl keeps the size of the saved filter; changed
+    BLOOMFILTER_* settings only take effect with a new JOBDIR.
+    """
+
+    def __init__(self, path=None, debug=False, *, fingerprinter=None, capacity=100000, error_rate=0.001):
+        super().__init__(path, debug, fingerprinter=fingerprinter)
+        self.bloom_path = os.path.join(path, 'requests.bloom') if path else None
+        if self.bloom_path and os.path.exists(self.bloom_path):
+            self.bloom = BloomFilter.load(self.bloom_path)
+            configured_bits, _ = BloomFilter.size_for(capacity, error_rate)
+            if (self.bloom.capacity, self.bloom.num_bits) != (capacity, configured_bits):
+                self.logger.warning(
+                    'Resuming with the Bloom filter saved in %s (capacity %d); BLOOMFILTER_CAPACITY=%d and '
+                    'BLOOMFILTER_ERROR_RATE=%g are ignored until the crawl is started with a new JOBDIR.',
+                    self.bloom_path, self.bloom.capacity, capacity, error_rate)
+        else:
+            self.bloom = BloomFilter(capacity, error_rate)
+        self.warned_full = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            job_dir(settings),
+            settings.getbool('DUPEFILTER_DEBUG'),
+            fingerprinter=crawler.request_fingerprinter,
+            capacity=settings.getint('BLOOMFILTER_CAPACITY', 100000),
+            error_rate=settings.getfloat('BLOOMFILTER_ERROR_RATE', 0.001),
+        )
+
+    def request_seen(self, request):
+        if not request.meta.get('bloom_dupefilter'):
+            return super().request_seen(request)
+        fp = self.request_fingerprint(request)
+        if fp in self.bloom:
+            return True
+        self.bloom.add(fp)
+        if len(self.bloom) > self.bloom.capacity and not self.warned_full:
+            self.logger.warning(
+                'Bloom dupefilter holds %d requests, over its capacity of %d; the false positive '
+                'rate will keep rising. Increase BLOOMFILTER_CAPACITY for the next crawl (a resumed '
+                'crawl keeps the filter saved in its JOBDIR, so start it with a new JOBDIR).',
+                len(self.bloom), self.bloom.capacity)
+            self.warned_full = True
+        return False
+
+    def close(self, reason):
+        super().close(reason)
+        if self.bloom_path:
+            self.bloom.save(self.bloom_path)
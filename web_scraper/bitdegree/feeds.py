@@ -0,0 +1,39 @@
+# Define here the feed item filters for your project
+#
+# Filters are set per feed with the "item_filter" key of the FEEDS setting
+# See: https://docs.scrapy.org/en/latest/topics/feed-exports.html#item-filtering
+
+from scrapy.extensions.feedexport import ItemFilter
+
+DETAIL_KINDS = ('coin', 'pair')
+
+
+def is_detail_item(item):
+    """
+    Tells deep-crawl coin and pair items apart from the per-exchange items.
+
+    Args:
+        item (dict): An item yielded by the spider.
+
+    Returns:
+        bool: True for `{'coin': ...}` and `{'pair': ...}` items.
+    """
+    return isinstance(item, dict) and len(item) == 1 and next(iter(item)) in DETAIL_KINDS
+
+
+class ExchangeItemFilter(ItemFilter):
+    """
+    Keeps only the per-exchange items, the layout `data.json` and the notebook expect.
+    """
+
+    def accepts(self, item):
+        return not is_detail_item(item)
+
+
+class DetailItemFilter(ItemFilter):
+    """
+    Keeps only the deep-crawl coin and pair items.
+    """
+
+    def accepts(self, item):
+        return is_detail_item(item)
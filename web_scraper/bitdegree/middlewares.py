@@ -3,11 +3,18 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
+from urllib.parse import urldefrag
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from bitdegree.archive import HtmlArchive
+
 
 class BitdegreeSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -101,3 +108,72 @@ class BitdegreeDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class HtmlArchiveMiddleware:
+    """
+    Stores every HTML response in a zstd-compressed archive (see `bitdegree.archive`).
+
+    Enabled with the ARCHIVE_ENABLED setting. Each response is written and committed
+    as soon as it arrives, compressed with the newest dictionary in the archive (or
+    plain zstd while the archive has none), so an interrupted crawl keeps every page
+    it fetched. When the crawl closes normally and the archive has no dictionary yet,
+    or ARCHIVE_RETRAIN_DICT is set (e.g. after the site markup changed), a new
+    dictionary is trained on this crawl's pages and its records are recompressed
+    with it; later crawls then use that dictionary.
+    """
+
+    def __init__(self, path, compression_level, dict_size, retrain_dict):
+        self.path = path
+        self.compression_level = compression_level
+        self.dict_size = dict_size
+        self.retrain_dict = retrain_dict
+        self.archive = None
+        self.crawl_time = None
+        self.dictionary_id = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ARCHIVE_ENABLED"):
+            raise NotConfigured
+        s = cls(
+            settings.get("ARCHIVE_PATH", "archive.sqlite3"),
+            settings.getint("ARCHIVE_COMPRESSION_LEVEL", 10),
+            settings.getint("ARCHIVE_DICT_SIZE", 112640),
+            settings.getbool("ARCHIVE_RETRAIN_DICT"),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_response(self, request, response, spider):
+        if isinstance(response, HtmlResponse) and 200 <= response.status < 300:
+            url = request.meta.get("redirect_urls", [request.url])[0]
+            self.archive.add(
+                self.crawl_time,
+                urldefrag(url)[0],
+                response.url,
+                response.status,
+                response.encoding,
+                response.body,
+                dictionary_id=self.dictionary_id,
+            )
+            self.archive.commit()
+        return response
+
+    def spider_opened(self, spider):
+        self.archive = HtmlArchive(self.path, self.compression_level)
+        self.crawl_time = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.dictionary_id = self.archive.latest_dictionary_id()
+        self.archive.add_crawl(self.crawl_time, deep_crawl=getattr(spider, "deep_crawl", False))
+        spider.logger.info("Archiving HTML responses to %s (crawl %s)" % (self.path, self.crawl_time))
+
+    def spider_closed(self, spider):
+        if self.dictionary_id is None or self.retrain_dict:
+            dictionary_id = self.archive.train_dictionary_from_crawl(self.crawl_time, self.dict_size)
+            if dictionary_id is not None:
+                self.archive.recompress_crawl(self.crawl_time, dictionary_id)
+            else:
+                spider.logger.info("Too few pages to train a zstd dictionary; records keep their compression")
+        self.archive.close()
@@ -0,0 +1,377 @@
+"""
+A small local HTTP/JSON server answering queries over the latest scraped snapshot.
+
+The server loads the `data.json` feed written by the `data_scraper` spider once,
+normalises it into per-exchange statistics and market rows, and precomputes the
+aggregates internal tools ask for (markets sorted by volume, a pair -> exchanges
+index). Every response carries an ETag derived from the snapshot contents so
+polling clients can revalidate with `If-None-Match`, and the snapshot file is
+watched so a new crawl is picked up without restarting the server.
+
+Usage:
+    python -m bitdegree.query_server --data bitdegree/spiders/data.json --port 8000
+
+Endpoints:
+    GET /exchanges                          Latest stats for every exchange.
+    GET /exchanges/<exchange>               Latest stats for one exchange.
+    GET /exchanges/<exchange>/markets?limit=N
+                                            Top pairs by volume on one exchange.
+    GET /markets/top?limit=N                Top pairs by volume across exchanges.
+    GET /pairs/<base>/<quote>               One pair (e.g. BTC/TRY) across exchanges.
+"""
+
+# Import libraries
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 1000
+RELOAD_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+def parse_volume(value):
+    """
+    Converts a scraped volume cell such as "$50,804,194" into a float.
+
+    Args:
+        value (str | None): The raw volume text.
+
+    Returns:
+        float: The volume in USD, or 0.0 when the cell is missing or malformed.
+    """
+    if not value:
+        return 0.0
+    try:
+        return float(str(value).replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return 0.0
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against the current ETag.
+
+    Uses the weak comparison required for If-None-Match: the header may list
+    several tags separated by commas, `W/` prefixes are ignored, and `*`
+    matches any current representation.
+
+    Args:
+        if_none_match (str | None): The raw header value.
+        etag (str): The current, quoted ETag.
+
+    Returns:
+        bool: True when the client's cached copy is still current.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class Snapshot:
+    """
+    An immutable, query-ready view of one `data.json` snapshot.
+    """
+
+    def __init__(self, raw_bytes, mtime):
+        """
+        Args:
+            raw_bytes (bytes): The contents of the snapshot file.
+            mtime (float): The modification time of the snapshot file.
+        """
+        self.mtime = mtime
+        self.etag = '"%s"' % hashlib.sha1(raw_bytes).hexdigest()
+        self.exchanges = {}
+        self.markets_by_exchange = {}
+        self.pairs = {}
+
+        entries = json.loads(raw_bytes)
+        if not isinstance(entries, list):
+            raise ValueError('snapshot must be a JSON list of items, got %s' % type(entries).__name__)
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise ValueError('snapshot items must be JSON objects, got %s' % type(entry).__name__)
+            for exchange_name, exchange_data in entry.items():
+                # Deep-crawl coin and pair items may share the feed; only exchange blocks have markets.
+                if not isinstance(exchange_data, dict) or 'markets' not in exchange_data:
+                    continue
+                if not isinstance(exchange_data['markets'], list) or \
+                        not all(isinstance(row, dict) for row in exchange_data['markets']):
+                    raise ValueError('markets of %s must be a list of JSON objects' % exchange_name)
+                self._add_exchange(exchange_name.lower(), exchange_data)
+
+        self.top_markets = sorted(
+            (market for markets in self.markets_by_exchange.values() for market in markets),
+            key=lambda market: market['volume'], reverse=True)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def _add_exchange(self, exchange, exchange_data):
+        """
+        Normalises one exchange block from the spider output and indexes its markets.
+
+        Stat keys lose their exchange prefix (`btcturk_volume` -> `volume`) and the
+        spider's token lists are joined back into plain strings.
+        """
+        prefix = exchange + '_'
+        stats = {}
+        for key, value in exchange_data.items():
+            if key == 'markets':
+                continue
+            key = key[len(prefix):] if key.startswith(prefix) else key
+            if key in ('markets', 'markets_raw'):
+                key = 'total_markets'
+            stats[key] = ' '.join(value) if isinstance(value, list) else value
+
+        markets = []
+        for row in exchange_data.get('markets', []):
+            name = row.get('Name')
+            if not name:
+                continue
+            market = {
+                'exchange': exchange,
+                'name': name,
+                'base_coin': ' '.join(row.get('Base Coin') or []),
+                'volume': parse_volume(row.get('Volume')),
+                'volume_share': ' '.join(row.get('Volume %') or []),
+            }
+            markets.append(market)
+            self.pairs.setdefault(name.upper(), []).append(market)
+        markets.sort(key=lambda market: market['volume'], reverse=True)
+
+        stats['exchange'] = exchange
+        stats['market_count'] = len(markets)
+        stats['scraped_volume'] = sum(market['volume'] for market in markets)
+        self.exchanges[exchange] = stats
+        self.markets_by_exchange[exchange] = markets
+
+    def query(self, path, params):
+        """
+        Answers a request path against this snapshot.
+
+        Encoded responses are memoised per snapshot, so repeated polls of the same
+        query only cost a dictionary lookup. Entries are keyed on the resolved
+        resource (see `_cache_key`) and only successful answers are kept, so the
+        cache is bounded by the exchanges and pairs in the snapshot and MAX_LIMIT.
+
+        Args:
+            path (str): The decoded request path.
+            params (dict): The parsed query string.
+
+        Returns:
+            tuple: An HTTP status code and the encoded JSON body.
+        """
+        parts = [part for part in path.split('/') if part]
+        limit = self._limit(params)
+        cache_key = self._cache_key(parts, limit)
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        status, payload = self._resolve(parts, limit)
+        result = (status, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        if status == 200 and cache_key is not None:
+            with self._cache_lock:
+                self._cache[cache_key] = result
+        return result
+
+    @staticmethod
+    def _limit(params):
+        try:
+            limit = int(params.get('limit', [DEFAULT_LIMIT])[0])
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        return max(1, min(limit, MAX_LIMIT))
+
+    @staticmethod
+    def _cache_key(parts, limit):
+        """
+        Maps a request onto the resource it names, so spelling variants (case, extra
+        slashes, an ignored `limit`) share one cache entry.
+        """
+        if parts == ['exchanges']:
+            return ('exchanges',)
+        if len(parts) == 2 and parts[0] == 'exchanges':
+            return ('exchange', parts[1].lower())
+        if len(parts) == 3 and parts[0] == 'exchanges' and parts[2] == 'markets':
+            return ('exchange_markets', parts[1].lower(), limit)
+        if parts == ['markets', 'top']:
+            return ('top_markets', limit)
+        if len(parts) == 3 and parts[0] == 'pairs':
+            return ('pair', ('%s/%s' % (parts[1], parts[2])).upper())
+        return None
+
+    def _resolve(self, parts, limit):
+        if parts == ['exchanges']:
+            return 200, list(self.exchanges.values())
+        if len(parts) in (2, 3) and parts[0] == 'exchanges':
+            exchange = parts[1].lower()
+            if exchange not in self.exchanges:
+                return 404, {'error': 'unknown exchange: %s' % parts[1]}
+            if len(parts) == 2:
+                return 200, self.exchanges[exchange]
+            if parts[2] == 'markets':
+                return 200, self.markets_by_exchange[exchange][:limit]
+        if parts == ['markets', 'top']:
+            return 200, self.top_markets[:limit]
+        if len(parts) == 3 and parts[0] == 'pairs':
+            name = '%s/%s' % (parts[1], parts[2])
+            markets = self.pairs.get(name.upper())
+            if markets is None:
+                return 404, {'error': 'unknown pair: %s' % name}
+            return 200, {'name': name.upper(), 'markets': markets}
+        return 404, {'error': 'not found'}
+
+
+class SnapshotStore:
+    """
+    Holds the current snapshot and swaps in a new one when the file changes.
+    """
+
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self.snapshot = None
+        self.failed_mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """
+        Reloads the snapshot if the file on disk has changed since the last load.
+
+        A file that fails to parse or does not have the layout of the spider's
+        feed (for example one still being written by a running crawl) is logged
+        and ignored, and the previous snapshot keeps being served.
+
+        Returns:
+            bool: True when a new snapshot was loaded.
+        """
+        with self._lock:
+            mtime = None
+            try:
+                mtime = os.stat(self.data_path).st_mtime
+                if self.snapshot is not None and mtime in (self.snapshot.mtime, self.failed_mtime):
+                    return False
+                with open(self.data_path, 'rb') as f:
+                    snapshot = Snapshot(f.read(), mtime)
+            except (OSError, ValueError) as e:
+                if self.snapshot is None:
+                    raise
+                if mtime is not None:
+                    # Log each bad version once; the file is retried when its mtime changes.
+                    self.failed_mtime = mtime
+                logger.warning('Keeping the previous snapshot, could not load %s: %s', self.data_path, e)
+                return False
+            self.snapshot = snapshot
+            self.failed_mtime = None
+            return True
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        """
+        Starts a daemon thread that polls the snapshot file for changes.
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception:
+                    # Never let one bad snapshot stop hot-reloading for the life of the server.
+                    logger.exception('Unexpected error reloading %s', self.data_path)
+
+        threading.Thread(target=run, name='snapshot-watcher', daemon=True).start()
+        return stop
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves snapshot queries as JSON with ETag revalidation.
+    """
+    server_version = 'BitdegreeQuery/1.0'
+    store = None
+
+    def do_GET(self):
+        snapshot = self.store.snapshot
+        url = urlsplit(self.path)
+        status, body = snapshot.query(unquote(url.path), parse_qs(url.query))
+        if status == 200 and etag_matches(self.headers.get('If-None-Match'), snapshot.etag):
+            self.send_response(304)
+            self.send_header('ETag', snapshot.etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 200:
+            self.send_header('ETag', snapshot.etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Internal tools poll constantly; keep the console quiet.
+        pass
+
+
+def make_server(data_path, host='127.0.0.1', port=8000):
+    """
+    Builds a threaded query server bound to the given snapshot file.
+
+    Args:
+        data_path (str): Path to the spider's `data.json` output.
+        host (str): Interface to bind.
+        port (int): Port to bind.
+
+    Returns:
+        ThreadingHTTPServer: The server, with its `store` attribute set.
+    """
+    store = SnapshotStore(data_path)
+    handler = type('BoundQueryRequestHandler', (QueryRequestHandler,), {'store': store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.store = store
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the latest scraped snapshot over HTTP/JSON.')
+    parser.add_argument('--data', default=os.path.join('bitdegree', 'spiders', 'data.json'),
+                        help='path to the data.json written by the data_scraper spider')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help='seconds between checks for a new snapshot')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    server = make_server(args.data, args.host, args.port)
+    server.store.watch(args.reload_interval)
+    print('Serving %s on http://%s:%d' % (args.data, args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Re-runs the current spider extractors over archived crawls, without network access.
+
+Each archived crawl is replayed through `DataScraperSpider` with the options it was
+crawled with: the start URL and every request the callbacks yield are answered from
+the archive instead of the web, so the chained callbacks see the same pages, in the
+same order, as during the original crawl. Crawls are independent of each other and
+are replayed in parallel worker processes.
+
+Exchange items are written to `<crawl time>.json` in the layout of `data.json`; the
+coin and pair items of deep crawls go to `<crawl time>.details.json`. As in a live
+crawl, an exception in a callback (typically old markup the current extractors no
+longer understand) is logged with its URL and counted, and the replay carries on.
+
+Usage:
+    python -m bitdegree.reparse archive.sqlite3 --output-dir reparsed --workers 8
+    python -m bitdegree.reparse archive.sqlite3 --crawl 2024-03-14T10:00:00Z
+"""
+
+# Import libraries
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urldefrag
+
+import scrapy
+from scrapy.http import HtmlResponse
+
+from bitdegree.archive import HtmlArchive
+from bitdegree.feeds import is_detail_item
+from bitdegree.spiders.data_scraper import DataScraperSpider
+
+logger = logging.getLogger(__name__)
+
+
+def replay_crawl(archive, crawl_time):
+    """
+    Replays one archived crawl through the spider's callbacks.
+
+    Args:
+        archive (HtmlArchive): The archive to read pages from.
+        crawl_time (str): The crawl to replay.
+
+    Returns:
+        tuple: The scraped items, the number of markets pages and of detail pages with no
+        archived page, and the number of callbacks that raised an exception.
+    """
+    spider = DataScraperSpider(deep_crawl=archive.crawl_options(crawl_time)['deep_crawl'])
+    queue = deque(scrapy.Request(url) for url in spider.start_urls)
+    seen = set()
+    items = []
+    missing = 0
+    missing_details = 0
+    errors = 0
+
+    while queue:
+        request = queue.popleft()
+        url = urldefrag(request.url)[0]
+        if url in seen:
+            continue
+        seen.add(url)
+
+        page = archive.response(crawl_time, url)
+        if page is None:
+            # A missing markets page loses that exchange's data; missing detail pages only
+            # lose one coin or pair (e.g. a Bloom filter false positive during the crawl).
+            if request.meta.get('bloom_dupefilter'):
+                missing_details += 1
+            else:
+                missing += 1
+            continue
+
+        response = HtmlResponse(page['response_url'], status=page['status'], body=page['body'],
+                                encoding=page['encoding'], request=request)
+        callback = request.callback or spider.parse
+        try:
+            # Results yielded before an exception are kept, as Scrapy does.
+            for result in callback(response, **request.cb_kwargs) or ():
+                if isinstance(result, scrapy.Request):
+                    queue.append(result)
+                else:
+                    items.append(result)
+        except Exception:
+            errors += 1
+            logger.exception('Crawl %s: error parsing %s with %s', crawl_time, response.url,
+                             getattr(callback, '__name__', callback))
+
+    return items, missing, missing_details, errors
+
+
+def reparse_crawl(archive_path, crawl_time, output_dir):
+    """
+    Re-parses one archived crawl and writes its items as `data.json`-style feeds.
+
+    Args:
+        archive_path (str): Path to the archive file.
+        crawl_time (str): The crawl to re-parse.
+        output_dir (str): Directory for the output files.
+
+    Returns:
+        dict: A summary with the crawl time, the exchange feed path, the exchange and
+        detail item counts, the missing markets and detail page counts and the number
+        of callback errors.
+    """
+    archive = HtmlArchive(archive_path)
+    try:
+        items, missing, missing_details, errors = replay_crawl(archive, crawl_time)
+    finally:
+        archive.close()
+
+    exchange_items = [item for item in items if not is_detail_item(item)]
+    detail_items = [item for item in items if is_detail_item(item)]
+    output_path = os.path.join(output_dir, crawl_time.replace(':', '-') + '.json')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(exchange_items, f, ensure_ascii=False)
+    if detail_items:
+        with open(output_path[:-len('.json')] + '.details.json', 'w', encoding='utf-8') as f:
+            json.dump(detail_items, f, ensure_ascii=False)
+    return {
+        'crawl_time': crawl_time,
+        'output_path': output_path,
+        'items': len(exchange_items),
+        'detail_items': len(detail_items),
+        'missing': missing,
+        'missing_details': missing_details,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-parse archived crawls with the current extractors.')
+    parser.add_argument('archive', help='path to the archive written by HtmlArchiveMiddleware')
+    parser.add_argument('--crawl', action='append', dest='crawls',
+                        help='crawl time to re-parse (repeatable); defaults to every archived crawl')
+    parser.add_argument('--output-dir', default='reparsed')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.crawls:
+        crawls = args.crawls
+    else:
+        archive = HtmlArchive(args.archive)
+        crawls = archive.crawl_times()
+        archive.close()
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(reparse_crawl, args.archive, crawl_time, args.output_dir): crawl_time
+                   for crawl_time in crawls}
+        for future, crawl_time in futures.items():
+            try:
+                summary = future.result()
+            except Exception as e:
+                # One unreadable snapshot must not abort the rest of a backfill.
+                failed.append(crawl_time)
+                print('%s: FAILED (%s: %s)' % (crawl_time, type(e).__name__, e))
+                continue
+            print('%(crawl_time)s: %(items)d exchange items, %(detail_items)d detail items -> %(output_path)s '
+                  '(%(missing)d markets pages and %(missing_details)d detail pages not archived, '
+                  '%(errors)d parse errors)' % summary)
+
+    if failed:
+        print('%d of %d crawls failed: %s' % (len(failed), len(crawls), ', '.join(failed)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -66,6 +66,26 @@ ROBOTSTXT_OBEY = True
 #    "bitdegree.pipelines.BitdegreePipeline": 300,
 #}
 
+# Deduplicate deep-crawl coin and pair requests with a memory-bounded Bloom filter; all other
+# requests keep exact deduplication. With JOBDIR set, the filter is persisted so resumed
+# crawls skip pages already followed. A warning is logged once the capacity is exceeded.
+DUPEFILTER_CLASS = "bitdegree.dupefilters.BloomDupeFilter"
+BLOOMFILTER_CAPACITY = 100000
+BLOOMFILTER_ERROR_RATE = 0.001
+
+# Archive raw HTML responses (zstd with a trained shared dictionary) for offline re-parsing
+# with `python -m bitdegree.reparse`. Enable per crawl with `-s ARCHIVE_ENABLED=1`.
+DOWNLOADER_MIDDLEWARES = {
+    "bitdegree.middlewares.HtmlArchiveMiddleware": 543,
+}
+ARCHIVE_ENABLED = False
+ARCHIVE_PATH = "archive.sqlite3"
+ARCHIVE_COMPRESSION_LEVEL = 10
+ARCHIVE_DICT_SIZE = 112640
+# The first crawl trains the dictionary that all later crawls use. Set this (e.g. with
+# `-s ARCHIVE_RETRAIN_DICT=1`) after the site markup changes to train a new one.
+ARCHIVE_RETRAIN_DICT = False
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
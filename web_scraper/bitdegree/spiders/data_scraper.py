@@ -6,6 +6,11 @@ This spider gathers overall statistics and market data from BtcTurk Pro, Binance
 and Paribu exchanges. The data includes volume, cryptocurrencies listed, market
 dominance, and market rank for each exchange.
 
+In deep-crawl mode (`-a deep_crawl=1`) it also follows every unique coin and pair
+detail page linked from the markets tables and yields their statistics. Those items
+go to a separate feed (`-a details_output=details.json`), so the exchange feed keeps
+the layout the analysis notebook expects.
+
 Author: Peyman Kh
 Date: 2024-03-12
 """
@@ -13,6 +18,8 @@ Date: 2024-03-12
 # Import libraries
 import scrapy
 
+from bitdegree.feeds import DetailItemFilter, ExchangeItemFilter
+
 
 class DataScraperSpider(scrapy.Spider):
     """
@@ -22,6 +29,80 @@ class DataScraperSpider(scrapy.Spider):
     allowed_domains = ["bitdegree.org"]
     start_urls = ["https://www.bitdegree.org/top-crypto-exchanges/btcturk-pro"]
 
+    def __init__(self, deep_crawl=False, details_output='details.json', *args, **kwargs):
+        """
+        Args:
+            deep_crawl (bool | str): When truthy (e.g. `-a deep_crawl=1`), also follow the coin and
+                pair detail pages linked from the markets tables to collect per-coin stats.
+            details_output (str): The feed URI the coin and pair items are written to.
+        """
+        super().__init__(*args, **kwargs)
+        self.deep_crawl = str(deep_crawl).lower() in ('1', 'true', 'yes', 'on')
+        self.details_output = details_output
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        """
+        Creates the spider and, in deep-crawl mode, splits the output into two feeds.
+
+        Every configured feed (e.g. `-O data.json`) only receives the exchange items, and the
+        coin and pair items are written to `details_output` instead.
+        """
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.deep_crawl:
+            feeds = crawler.settings.getdict('FEEDS')
+            for options in feeds.values():
+                options.setdefault('item_filter', ExchangeItemFilter)
+            feeds[spider.details_output] = {'format': 'json', 'overwrite': True, 'item_filter': DetailItemFilter}
+            # Keep the priority of the existing feeds (e.g. 'cmdline' for -O) so this update wins.
+            crawler.settings.set('FEEDS', feeds, priority=crawler.settings.getpriority('FEEDS'))
+        return spider
+
+    def follow_detail_pages(self, response, rows):
+        """
+        Follows the coin and pair detail pages linked from a markets table in deep-crawl mode.
+
+        The same coins and pairs appear on every exchange, so most of these links repeat. These
+        requests are marked for the Bloom filter (see `bitdegree.dupefilters.BloomDupeFilter`),
+        which makes sure each page is fetched only once per crawl.
+
+        Args:
+            response (scrapy.http.Response): The response object for a markets page.
+            rows (scrapy.selector.SelectorList): The rows of the markets table.
+
+        Yields:
+            scrapy.Request: A request object for each coin and pair detail page.
+        """
+        if not self.deep_crawl:
+            return
+        for row in rows:
+            coin_url = row.css('td:nth-child(2) a::attr(href)').get()
+            if coin_url:
+                yield response.follow(coin_url, callback=self.parse_detail, cb_kwargs={'kind': 'coin'},
+                                      meta={'bloom_dupefilter': True})
+            pair_url = row.css('td:nth-child(4) a::attr(href)').get()
+            if pair_url:
+                yield response.follow(pair_url, callback=self.parse_detail, cb_kwargs={'kind': 'pair'},
+                                      meta={'bloom_dupefilter': True})
+
+    def parse_detail(self, response, kind):
+        """
+        Parses a coin or pair detail page to gather its statistics.
+
+        Args:
+            response (scrapy.http.Response): The response object for the detail page.
+            kind (str): Either 'coin' or 'pair'.
+
+        Yields:
+            dict: A dictionary containing the gathered data for the coin or pair.
+        """
+        yield {kind: {
+            'url': response.url,
+            'name': str(response.css('h1::text').get()).split(),
+            'stats': [str(value).split() for value in
+                      response.css('div.overall-stats span.stats-value::text').getall()],
+        }}
+
     def parse(self, response):
         """
         Parses the main page of BtcTurk Pro exchange to gather overall statistics.
@@ -70,6 +151,7 @@ class DataScraperSpider(scrapy.Spider):
             btcturk_markets.append(market_data)
 
         btcturk_data['markets'].extend(btcturk_markets)
+        yield from self.follow_detail_pages(response, table_btcturk)
 
         btcturk_assets_page2 = 'https://www.bitdegree.org/top-crypto-exchanges/btcturk-pro/markets?page=2#all-markets'
         yield response.follow(btcturk_assets_page2, callback=self.parse_btcturk_asset2,
@@ -98,6 +180,7 @@ class DataScraperSpider(scrapy.Spider):
             btcturk_markets.append(market_data)
 
         btcturk_data['markets'].extend(btcturk_markets)
+        yield from self.follow_detail_pages(response, table_btcturk)
 
         btcturk_assets_page3 = 'https://www.bitdegree.org/top-crypto-exchanges/btcturk-pro/markets?page=3#all-markets'
         yield response.follow(btcturk_assets_page3, callback=self.parse_btcturk_asset3,
@@ -126,6 +209,7 @@ class DataScraperSpider(scrapy.Spider):
             btcturk_markets.append(market_data)
 
         btcturk_data['markets'].extend(btcturk_markets)
+        yield from self.follow_detail_pages(response, table_btcturk)
 
         btcturk_assets_page4 = 'https://www.bitdegree.org/top-crypto-exchanges/btcturk-pro/markets?page=4#all-markets'
         yield response.follow(btcturk_assets_page4, callback=self.parse_btcturk_asset4,
@@ -154,6 +238,7 @@ class DataScraperSpider(scrapy.Spider):
             btcturk_markets.append(market_data)
 
         btcturk_data['markets'].extend(btcturk_markets)
+        yield from self.follow_detail_pages(response, table_btcturk)
 
         btcturk_assets_page5 = 'https://www.bitdegree.org/top-crypto-exchanges/btcturk-pro/markets?page=5#all-markets'
         yield response.follow(btcturk_assets_page5, callback=self.parse_btcturk_asset5,
@@ -182,6 +267,7 @@ class DataScraperSpider(scrapy.Spider):
             btcturk_markets.append(market_data)
 
         btcturk_data['markets'].extend(btcturk_markets)
+        yield from self.follow_detail_pages(response, table_btcturk)
 
         binance_url = 'https://www.bitdegree.org/top-crypto-exchanges/binance-tr'
         yield response.follow(binance_url, callback=self.parse_binance,
@@ -240,6 +326,7 @@ class DataScraperSpider(scrapy.Spider):
             binance_markets.append(market_data)
 
         binance_data['markets'].extend(binance_markets)
+        yield from self.follow_detail_pages(response, table_binance)
 
         binance_assets_page2 = 'https://www.bitdegree.org/top-crypto-exchanges/binance-tr/markets?page=2#all-markets'
         yield response.follow(binance_assets_page2, callback=self.parse_binance_asset2,
@@ -269,6 +356,7 @@ class DataScraperSpider(scrapy.Spider):
             binance_markets.append(market_data)
 
         binance_data['markets'].extend(binance_markets)
+        yield from self.follow_detail_pages(response, table_binance)
 
         binance_assets_page3 = 'https://www.bitdegree.org/top-crypto-exchanges/binance-tr/markets?page=3#all-markets'
         yield response.follow(binance_assets_page3, callback=self.parse_binance_asset3,
@@ -298,6 +386,7 @@ class DataScraperSpider(scrapy.Spider):
             binance_markets.append(market_data)
 
         binance_data['markets'].extend(binance_markets)
+        yield from self.follow_detail_pages(response, table_binance)
 
         binance_assets_page4 = 'https://www.bitdegree.org/top-crypto-exchanges/binance-tr/markets?page=4#all-markets'
         yield response.follow(binance_assets_page4, callback=self.parse_binance_asset4,
@@ -327,6 +416,7 @@ class DataScraperSpider(scrapy.Spider):
             binance_markets.append(market_data)
 
         binance_data['markets'].extend(binance_markets)
+        yield from self.follow_detail_pages(response, table_binance)
 
         paribu_url = 'https://www.bitdegree.org/top-crypto-exchanges/paribu'
         yield response.follow(paribu_url, callback=self.parse_paribu,
@@ -387,6 +477,7 @@ class DataScraperSpider(scrapy.Spider):
             paribu_markets.append(market_data)
 
         paribu_data['markets'].extend(paribu_markets)
+        yield from self.follow_detail_pages(response, table_paribu)
 
         paribu_assets_page2 = 'https://www.bitdegree.org/top-crypto-exchanges/paribu/markets?page=2#all-markets'
         yield response.follow(paribu_assets_page2, callback=self.parse_paribu_asset2,
@@ -417,6 +508,7 @@ class DataScraperSpider(scrapy.Spider):
             paribu_markets.append(market_data)
 
         paribu_data['markets'].extend(paribu_markets)
+        yield from self.follow_detail_pages(response, table_paribu)
 
         paribu_assets_page3 = 'https://www.bitdegree.org/top-crypto-exchanges/paribu/markets?page=3#all-markets'
         yield response.follow(paribu_assets_page3, callback=self.parse_paribu_asset3,
@@ -447,6 +539,7 @@ class DataScraperSpider(scrapy.Spider):
             paribu_markets.append(market_data)
 
         paribu_data['markets'].extend(paribu_markets)
+        yield from self.follow_detail_pages(response, table_paribu)
 
         paribu_assets_page4 = 'https://www.bitdegree.org/top-crypto-exchanges/paribu/markets?page=4#all-markets'
         yield response.follow(paribu_assets_page4, callback=self.parse_paribu_asset4,
@@ -478,5 +571,6 @@ class DataScraperSpider(scrapy.Spider):
             paribu_markets.append(market_data)
 
         paribu_data['markets'].extend(paribu_markets)
+        yield from self.follow_detail_pages(response, table_paribu)
 
         yield {'Paribu': paribu_data}
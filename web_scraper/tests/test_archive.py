@@ -0,0 +1,191 @@
+import json
+import random
+import re
+import sys
+
+import pytest
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from bitdegree.archive import HtmlArchive
+from bitdegree.middlewares import HtmlArchiveMiddleware
+from bitdegree import reparse
+from bitdegree.reparse import reparse_crawl
+from bitdegree.spiders import data_scraper
+from bitdegree.spiders.data_scraper import DataScraperSpider
+
+CRAWL = '2024-03-14T10:00:00Z'
+
+
+def make_page(rows=20, links=False):
+    stats = ''.join('<span class="stats-value">%d</span>' % random.randint(1, 999) for _ in range(6))
+    cells = []
+    for i in range(rows):
+        coin = '<div class="mr-1">Coin %d</div>' % i
+        pair = '<strong>C%d/TRY</strong>' % i
+        if links:
+            coin = '<a href="/coins/c%d">%s</a>' % (i, coin)
+            pair = '<a href="/pairs/c%d-try">%s</a>' % (i, pair)
+        cells.append('<tr><td>%d</td><td>%s</td><td></td><td>%s</td><td></td><td><span>$%d</span></td>'
+                     '<td>1.0%%</td></tr>' % (i, coin, pair, random.randint(1, 10 ** 6)))
+    return ('<html><body><nav>%s</nav><div class="overall-stats">%s</div>'
+            '<div class="exchange-currencies-table"><div class="table-wrp"><table class="table"><tbody>%s'
+            '</tbody></table></div></div></body></html>' % ('menu ' * 200, stats, ''.join(cells))).encode('utf-8')
+
+
+def chain_urls():
+    # Every exchange and markets page the spider chains through.
+    with open(data_scraper.__file__, encoding='utf-8') as f:
+        urls = set(re.findall(r"'(https://www\.bitdegree\.org[^']+)'", f.read()))
+    return sorted(urls | set(DataScraperSpider.start_urls))
+
+
+def test_add_and_read_back_without_dictionary(tmp_path):
+    archive = HtmlArchive(str(tmp_path / 'archive.sqlite3'))
+    archive.add(CRAWL, 'https://www.bitdegree.org/a', 'https://www.bitdegree.org/a', 200, 'utf-8', b'<html>a</html>')
+    archive.commit()
+
+    record = archive.response(CRAWL, 'https://www.bitdegree.org/a')
+    assert record['body'] == b'<html>a</html>'
+    assert archive.response(CRAWL, 'https://www.bitdegree.org/b') is None
+    assert archive.crawl_times() == [CRAWL]
+    archive.close()
+
+
+def test_add_and_read_back_with_dictionary(tmp_path):
+    archive = HtmlArchive(str(tmp_path / 'archive.sqlite3'))
+    dictionary_id = archive.train_dictionary([make_page() for _ in range(30)], 16384)
+    assert dictionary_id is not None
+
+    body = make_page()
+    archive.add(CRAWL, 'https://www.bitdegree.org/a', 'https://www.bitdegree.org/a', 200, 'utf-8', body,
+                dictionary_id=dictionary_id)
+    archive.commit()
+    assert [record['body'] for record in archive.responses(CRAWL)] == [body]
+    archive.close()
+
+
+def test_recompress_crawl_keeps_bodies(tmp_path):
+    archive = HtmlArchive(str(tmp_path / 'archive.sqlite3'))
+    bodies = [make_page() for _ in range(30)]
+    for i, body in enumerate(bodies):
+        url = 'https://www.bitdegree.org/%d' % i
+        archive.add(CRAWL, url, url, 200, 'utf-8', body)
+    dictionary_id = archive.train_dictionary_from_crawl(CRAWL, 16384)
+    # A batch size that does not divide the crawl exercises the last partial batch.
+    archive.recompress_crawl(CRAWL, dictionary_id, batch_size=7)
+
+    assert [record['body'] for record in archive.responses(CRAWL)] == bodies
+    assert archive.connection.execute(
+        'SELECT COUNT(*) FROM responses WHERE dictionary_id IS NULL').fetchone()[0] == 0
+    archive.close()
+
+
+def test_archive_uses_write_ahead_log(tmp_path):
+    archive = HtmlArchive(str(tmp_path / 'archive.sqlite3'))
+    assert archive.connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    archive.close()
+
+
+def run_middleware(tmp_path, urls, close=True, deep_crawl=False, page=None, **settings):
+    settings = dict({'ARCHIVE_ENABLED': True, 'ARCHIVE_PATH': str(tmp_path / 'archive.sqlite3'),
+                     'ARCHIVE_DICT_SIZE': 16384}, **settings)
+    middleware = HtmlArchiveMiddleware.from_crawler(get_crawler(DataScraperSpider, settings))
+    spider = DataScraperSpider(deep_crawl=deep_crawl)
+    middleware.spider_opened(spider)
+    for url in urls:
+        request = Request(url)
+        body = page(url) if page else make_page(links=deep_crawl)
+        response = HtmlResponse(url.split('#')[0], body=body, encoding='utf-8',
+                                request=request)
+        middleware.process_response(request, response, spider)
+    if close:
+        middleware.spider_closed(spider)
+    return middleware
+
+
+def test_middleware_commits_each_response(tmp_path):
+    middleware = run_middleware(tmp_path, chain_urls()[:3], close=False)
+    # Another connection sees the pages before the crawl closes.
+    reader = HtmlArchive(middleware.path)
+    assert len(list(reader.responses(middleware.crawl_time))) == 3
+    reader.close()
+
+
+def test_middleware_trains_dictionary_at_close_and_only_once(tmp_path):
+    first = run_middleware(tmp_path, chain_urls())
+    archive = HtmlArchive(first.path)
+    dictionary_id = archive.latest_dictionary_id()
+    assert dictionary_id is not None
+    assert {row[0] for row in archive.connection.execute('SELECT dictionary_id FROM responses')} == {dictionary_id}
+    archive.close()
+
+    run_middleware(tmp_path, chain_urls())
+    archive = HtmlArchive(first.path)
+    assert archive.latest_dictionary_id() == dictionary_id
+    archive.close()
+
+    run_middleware(tmp_path, chain_urls(), ARCHIVE_RETRAIN_DICT=True)
+    archive = HtmlArchive(first.path)
+    assert archive.latest_dictionary_id() != dictionary_id
+    archive.close()
+
+
+@pytest.mark.parametrize('deep_crawl', [False, True])
+def test_reparse_replays_crawl_with_its_options(tmp_path, deep_crawl):
+    urls = chain_urls()
+    if deep_crawl:
+        urls += ['https://www.bitdegree.org/coins/c%d' % i for i in range(20)]
+        urls += ['https://www.bitdegree.org/pairs/c%d-try' % i for i in range(20)]
+    middleware = run_middleware(tmp_path, urls, deep_crawl=deep_crawl)
+
+    summary = reparse_crawl(middleware.path, middleware.crawl_time, str(tmp_path))
+    with open(summary['output_path'], encoding='utf-8') as f:
+        items = json.load(f)
+
+    # The notebook reads the exchanges by position; detail items must not come first.
+    assert [list(item) for item in items] == [['btcturk'], ['binance'], ['Paribu']]
+    assert (summary['missing'], summary['missing_details'], summary['errors']) == (0, 0, 0)
+    assert summary['detail_items'] == (40 if deep_crawl else 0)
+
+
+def test_reparse_survives_markup_the_extractors_cannot_parse(tmp_path, caplog):
+    binance_url = 'https://www.bitdegree.org/top-crypto-exchanges/binance-tr'
+
+    def page(url):
+        # The Binance overview lost its stats block, so `binance_statics[0]` raises IndexError.
+        if url == binance_url:
+            return b'<html><body><h1>Redesigned</h1></body></html>'
+        return make_page()
+
+    middleware = run_middleware(tmp_path, chain_urls(), page=page)
+    summary = reparse_crawl(middleware.path, middleware.crawl_time, str(tmp_path))
+    with open(summary['output_path'], encoding='utf-8') as f:
+        items = json.load(f)
+
+    # The BtcTurk item yielded alongside the failing request is kept; the chain stops there.
+    assert [list(item) for item in items] == [['btcturk']]
+    assert summary['errors'] == 1
+    assert any(binance_url in record.getMessage() for record in caplog.records)
+
+
+def test_reparse_main_reports_a_failed_crawl_and_continues(tmp_path, monkeypatch, capsys):
+    middleware = run_middleware(tmp_path, chain_urls())
+    archive = HtmlArchive(middleware.path)
+    # A second crawl whose start page is corrupt on disk, so reading it raises.
+    archive.connection.execute(
+        "INSERT INTO responses (crawl_time, url, response_url, status, encoding, fetched_at, dictionary_id, body)"
+        " SELECT '0000-bad', url, response_url, status, encoding, fetched_at, dictionary_id, x'00'"
+        " FROM responses WHERE crawl_time = ?", (middleware.crawl_time,))
+    archive.close()
+
+    monkeypatch.setattr(sys, 'argv', ['reparse', middleware.path, '--output-dir', str(tmp_path / 'out'),
+                                      '--workers', '1'])
+    with pytest.raises(SystemExit) as exit_info:
+        reparse.main()
+    out = capsys.readouterr().out
+
+    assert exit_info.value.code == 1
+    assert '0000-bad: FAILED' in out
+    assert '%s: 3 exchange items' % middleware.crawl_time in out
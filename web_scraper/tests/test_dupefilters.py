@@ -0,0 +1,118 @@
+import logging
+
+import pytest
+from scrapy import Request
+from scrapy.crawler import Crawler
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from bitdegree.dupefilters import BloomDupeFilter, BloomFilter
+from bitdegree.feeds import DetailItemFilter, ExchangeItemFilter
+from bitdegree.spiders.data_scraper import DataScraperSpider
+
+
+def detail_request(url):
+    return Request(url, meta={'bloom_dupefilter': True})
+
+
+def make_dupefilter(**settings):
+    crawler = get_crawler(DataScraperSpider, settings)
+    return BloomDupeFilter.from_crawler(crawler)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add('fp%d' % i)
+    assert all('fp%d' % i in bloom for i in range(1000))
+    assert len(bloom) == 1000
+
+
+def test_bloom_filter_save_load_round_trip(tmp_path):
+    path = str(tmp_path / 'requests.bloom')
+    bloom = BloomFilter(100, 0.01)
+    bloom.add('seen')
+    bloom.save(path)
+
+    loaded = BloomFilter.load(path)
+    assert 'seen' in loaded
+    assert (loaded.capacity, loaded.num_bits, loaded.num_hashes, len(loaded)) == \
+        (bloom.capacity, bloom.num_bits, bloom.num_hashes, 1)
+
+
+def test_bloom_filter_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'requests.bloom'
+    path.write_bytes(b'not a filter')
+    with pytest.raises(ValueError):
+        BloomFilter.load(str(path))
+
+
+@pytest.mark.parametrize('capacity', [0, -1])
+def test_bloom_filter_rejects_non_positive_capacity(capacity):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity, 0.001)
+
+
+def test_dupefilter_persists_under_jobdir(tmp_path):
+    dupefilter = make_dupefilter(JOBDIR=str(tmp_path))
+    assert not dupefilter.request_seen(detail_request('https://www.bitdegree.org/coin/btc'))
+    dupefilter.close('shutdown')
+
+    resumed = make_dupefilter(JOBDIR=str(tmp_path))
+    assert resumed.request_seen(detail_request('https://www.bitdegree.org/coin/btc'))
+    assert not resumed.request_seen(detail_request('https://www.bitdegree.org/coin/eth'))
+    resumed.close('finished')
+
+
+def test_unmarked_requests_use_exact_deduplication():
+    dupefilter = make_dupefilter(BLOOMFILTER_CAPACITY=1)
+    # Fill the Bloom filter so every further lookup in it would be a hit.
+    dupefilter.bloom.bits[:] = b'\xff' * len(dupefilter.bloom.bits)
+    request = Request('https://www.bitdegree.org/top-crypto-exchanges/binance/markets?page=2')
+    assert not dupefilter.request_seen(request)
+    assert dupefilter.request_seen(request)
+
+
+def test_dupefilter_warns_once_over_capacity(caplog):
+    dupefilter = make_dupefilter(BLOOMFILTER_CAPACITY=2)
+    with caplog.at_level(logging.WARNING):
+        for i in range(5):
+            dupefilter.request_seen(detail_request('https://www.bitdegree.org/coin/%d' % i))
+    assert len([r for r in caplog.records if 'over its capacity' in r.getMessage()]) == 1
+
+
+def test_dupefilter_rejects_non_positive_capacity_setting():
+    with pytest.raises(ValueError):
+        make_dupefilter(BLOOMFILTER_CAPACITY=0)
+
+
+def test_deep_crawl_splits_detail_items_into_their_own_feed():
+    # Settings are still mutable when Scrapy creates the spider; get_crawler() has frozen them.
+    settings = Settings()
+    settings.set('FEEDS', {'data.json': {'format': 'json'}}, priority='cmdline')
+    crawler = Crawler(DataScraperSpider, settings)
+    DataScraperSpider.from_crawler(crawler, deep_crawl='1', details_output='coins.json')
+
+    feeds = crawler.settings.getdict('FEEDS')
+    assert feeds['data.json']['item_filter'] is ExchangeItemFilter
+    assert feeds['coins.json']['item_filter'] is DetailItemFilter
+
+    exchange_item, coin_item = {'binance': {'markets': []}}, {'coin': {'url': 'x'}}
+    assert ExchangeItemFilter(None).accepts(exchange_item)
+    assert not ExchangeItemFilter(None).accepts(coin_item)
+    assert DetailItemFilter(None).accepts(coin_item)
+
+
+def test_resumed_crawl_reports_ignored_capacity_setting(tmp_path, caplog):
+    make_dupefilter(JOBDIR=str(tmp_path), BLOOMFILTER_CAPACITY=10).close('shutdown')
+
+    with caplog.at_level(logging.WARNING):
+        resumed = make_dupefilter(JOBDIR=str(tmp_path), BLOOMFILTER_CAPACITY=1000)
+    assert resumed.bloom.capacity == 10
+    assert any('new JOBDIR' in r.getMessage() for r in caplog.records)
+    resumed.close('finished')
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        make_dupefilter(JOBDIR=str(tmp_path), BLOOMFILTER_CAPACITY=10).close('finished')
+    assert not any('new JOBDIR' in r.getMessage() for r in caplog.records)
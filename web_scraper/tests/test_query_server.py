@@ -0,0 +1,164 @@
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+from bitdegree.query_server import Snapshot, SnapshotStore, etag_matches, make_server
+
+DATA = [
+    {'btcturk': {
+        'btcturk_volume': ['$100'], 'btcturk_markets_raw': ['2'],
+        'markets': [
+            {'Base Coin': ['Bitcoin'], 'Name': 'BTC/TRY', 'Volume': '$30', 'Volume %': ['30%']},
+            {'Base Coin': ['Tether'], 'Name': 'USDT/TRY', 'Volume': '$70', 'Volume %': ['70%']},
+        ]}},
+    {'Paribu': {
+        'paribu_volume': ['$50'], 'paribu_markets': ['1'],
+        'markets': [{'Base Coin': ['Bitcoin'], 'Name': 'BTC/TRY', 'Volume': '$50', 'Volume %': ['100%']}]}},
+]
+
+
+def make_snapshot():
+    return Snapshot(json.dumps(DATA).encode('utf-8'), 0.0)
+
+
+def query(snapshot, path, **params):
+    status, body = snapshot.query(path, {key: [str(value)] for key, value in params.items()})
+    return status, json.loads(body)
+
+
+def test_exchange_stats_are_normalised():
+    status, stats = query(make_snapshot(), '/exchanges/paribu')
+    assert status == 200
+    assert stats['volume'] == '$50'
+    assert stats['total_markets'] == '1'
+    assert stats['market_count'] == 1
+
+
+def test_top_markets_are_sorted_by_volume():
+    status, markets = query(make_snapshot(), '/markets/top', limit=2)
+    assert status == 200
+    assert [(m['exchange'], m['name']) for m in markets] == [('btcturk', 'USDT/TRY'), ('paribu', 'BTC/TRY')]
+
+
+def test_pair_across_exchanges():
+    status, pair = query(make_snapshot(), '/pairs/btc/try')
+    assert status == 200
+    assert sorted(m['exchange'] for m in pair['markets']) == ['btcturk', 'paribu']
+
+
+@pytest.mark.parametrize('path', ['/nope', '/exchanges/kraken', '/pairs/xyz/try'])
+def test_unknown_paths_are_not_found(path):
+    assert query(make_snapshot(), path)[0] == 404
+
+
+def test_etag_matches_lists_weak_tags_and_wildcard():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches('*', '"abc"')
+    assert not etag_matches('"x"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.fixture
+def server(tmp_path):
+    data_path = tmp_path / 'data.json'
+    data_path.write_text(json.dumps(DATA), encoding='utf-8')
+    server = make_server(str(data_path), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.request('GET', path, headers=headers or {})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response
+
+
+def test_not_modified_only_for_found_resources(server):
+    etag = get(server, '/exchanges').getheader('ETag')
+    assert get(server, '/exchanges', {'If-None-Match': etag}).status == 304
+    assert get(server, '/exchanges', {'If-None-Match': 'W/%s' % etag}).status == 304
+    assert get(server, '/nope', {'If-None-Match': etag}).status == 404
+    assert get(server, '/nope', {'If-None-Match': '*'}).status == 404
+
+
+def test_case_and_slash_variants_share_one_cache_entry():
+    snapshot = make_snapshot()
+    for path in ['/pairs/BTC/TRY', '/pairs/btc/try/', '//pairs/bTc/TrY']:
+        query(snapshot, path, limit=5)
+    query(snapshot, '/exchanges', limit=1)
+    query(snapshot, '/exchanges', limit=2)
+    query(snapshot, '/nope')
+    assert sorted(snapshot._cache) == [('exchanges',), ('pair', 'BTC/TRY')]
+
+
+def write_snapshot(path, content, mtime):
+    path.write_text(content, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def test_reload_swaps_snapshot_when_file_changes(tmp_path):
+    data_path = tmp_path / 'data.json'
+    write_snapshot(data_path, json.dumps(DATA), 1000)
+    store = SnapshotStore(str(data_path))
+    old = store.snapshot
+
+    assert not store.reload()
+    write_snapshot(data_path, json.dumps(DATA[:1]), 2000)
+    assert store.reload()
+    assert store.snapshot is not old
+    assert store.snapshot.etag != old.etag
+    assert list(store.snapshot.exchanges) == ['btcturk']
+
+
+@pytest.mark.parametrize('content', ['[{"btcturk": {"markets": [', '{"a": 1}', '[1, 2]',
+                                     '[{"btcturk": {"markets": "none"}}]'])
+def test_reload_keeps_previous_snapshot_for_invalid_file(tmp_path, content):
+    data_path = tmp_path / 'data.json'
+    write_snapshot(data_path, json.dumps(DATA), 1000)
+    store = SnapshotStore(str(data_path))
+    old = store.snapshot
+
+    write_snapshot(data_path, content, 2000)
+    assert not store.reload()
+    assert store.snapshot is old
+
+    # Once the crawl finishes writing, the new snapshot is picked up.
+    write_snapshot(data_path, json.dumps(DATA[:1]), 3000)
+    assert store.reload()
+
+
+def test_invalid_first_snapshot_is_an_error(tmp_path):
+    data_path = tmp_path / 'data.json'
+    write_snapshot(data_path, '{"a": 1}', 1000)
+    with pytest.raises(ValueError):
+        SnapshotStore(str(data_path))
+
+
+def test_watcher_keeps_polling_after_unexpected_error(tmp_path, monkeypatch):
+    data_path = tmp_path / 'data.json'
+    write_snapshot(data_path, json.dumps(DATA), 1000)
+    store = SnapshotStore(str(data_path))
+    calls = []
+    polled_twice = threading.Event()
+
+    def reload():
+        calls.append(1)
+        if len(calls) == 1:
+            raise AttributeError('boom')
+        polled_twice.set()
+
+    monkeypatch.setattr(store, 'reload', reload)
+    stop = store.watch(interval=0.01)
+    try:
+        assert polled_twice.wait(5)
+    finally:
+        stop.set()